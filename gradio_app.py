@@ -4,49 +4,85 @@ import shutil
 from src.db_manager import DBManager
 from src.document_processor import DocumentProcessor
 from src.image_processor import ImageProcessor
+from src.image_tagger import ImageTagger, load_labels_or_default
+from src.model_registry import configure_registry, format_registry_report
+from src.search_cache import configure_search_cache
 from PIL import Image
 
+def env_float(name):
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: ignoring invalid {name}={value!r} (expected a number).")
+        return None
+
+# Model residency: unload idle models and cap total model memory (configurable via env)
+MODEL_MEMORY_BUDGET_MB = env_float("LMA_MODEL_MEMORY_BUDGET_MB")
+MODEL_IDLE_TIMEOUT = env_float("LMA_MODEL_IDLE_TIMEOUT")
+# Paged search: candidates computed per query (LMA_SEARCH_DEPTH) and cache lifetime in seconds (LMA_SEARCH_CACHE_TTL)
+# (LMA_SEARCH_CACHE_TTL=none disables expiry, 0 disables reuse between pages)
+def env_ttl(name, default):
+    if os.environ.get(name, "").strip().lower() in ("none", "off"):
+        return None
+    value = env_float(name)
+    return default if value is None else value
+
+SEARCH_DEPTH = env_float("LMA_SEARCH_DEPTH")
+SEARCH_DEPTH = int(SEARCH_DEPTH) if SEARCH_DEPTH is not None else 200
+SEARCH_CACHE_TTL = env_ttl("LMA_SEARCH_CACHE_TTL", 300)
+# Zero-shot auto-tagging at ingest (set LMA_AUTO_TAG=1; optional LMA_TAG_LABELS=path/to/labels.txt,
+# LMA_TAG_TOP_K and LMA_TAG_MIN_SCORE)
+AUTO_TAG = os.environ.get("LMA_AUTO_TAG", "") == "1"
+TAG_LABELS_PATH = os.environ.get("LMA_TAG_LABELS")
+TAG_TOP_K = env_float("LMA_TAG_TOP_K")
+TAG_MIN_SCORE = env_float("LMA_TAG_MIN_SCORE")
+
 # Initialize System
-# Note: Models will be loaded on startup
+# Note: Models are loaded on first use and may be unloaded when idle
 print("Initializing system components...")
 try:
+    registry = configure_registry(memory_budget_mb=MODEL_MEMORY_BUDGET_MB, idle_timeout=MODEL_IDLE_TIMEOUT)
+    configure_search_cache(depth=max(1, SEARCH_DEPTH), ttl=SEARCH_CACHE_TTL)
     db = DBManager()
     doc_processor = DocumentProcessor(db)
-    img_processor = ImageProcessor(db)
+    # A bad labels file only affects tagging: fall back to the default labels with a warning
+    tagger = ImageTagger(
+        labels=load_labels_or_default(TAG_LABELS_PATH),
+        top_k=int(TAG_TOP_K) if TAG_TOP_K is not None else 3,
+        min_score=TAG_MIN_SCORE if TAG_MIN_SCORE is not None else 0.1
+    )
+    img_processor = ImageProcessor(db, tagger=tagger if AUTO_TAG else None)
     print("System initialized successfully.")
 except Exception as e:
     print(f"Error initializing system: {e}")
+    registry = None
+    tagger = None
     db = None
     doc_processor = None
     img_processor = None
 
-def format_paper_results(results):
-    if not results['ids']:
-        return "No results found."
-    
+def format_paper_results(page):
+    start = (page['page'] - 1) * page['page_size']
     output = ""
-    for i, doc_id in enumerate(results['ids'][0]):
-        meta = results['metadatas'][0][i]
-        dist = results['distances'][0][i]
-        output += f"### {i+1}. {meta.get('filename')}\n"
-        output += f"**Score:** {dist:.4f}  \n"
-        output += f"**Path:** `{meta.get('path')}`  \n"
-        output += f"**Topics:** {meta.get('topics')}  \n"
-        output += f"**Snippet:** {meta.get('snippet')}...\n\n"
+    for i, item in enumerate(page['items']):
+        output += f"### {start+i+1}. {item['filename']}\n"
+        output += f"**Score:** {item['score']:.4f}  \n"
+        output += f"**Path:** `{item['path']}`  \n"
+        output += f"**Topics:** {item['topics']}  \n"
+        output += f"**Snippet:** {item['snippet']}...\n\n"
         output += "---\n"
     return output
 
-def format_image_results(results):
-    if not results['ids']:
-        return []
-    
+def format_image_results(page):
     images = []
-    for i, img_id in enumerate(results['ids'][0]):
-        meta = results['metadatas'][0][i]
-        dist = results['distances'][0][i]
-        path = meta.get('path')
-        caption = f"{meta.get('filename')} (Score: {dist:.4f})"
-        if os.path.exists(path):
+    for item in page['items']:
+        # Prefer the precomputed thumbnail to keep the gallery light
+        path = item['thumbnail'] or item['path']
+        caption = f"{item['filename']} (Score: {item['score']:.4f})"
+        if path and os.path.exists(path):
             images.append((path, caption))
     return images
 
@@ -83,12 +119,26 @@ def batch_add_paper(dir_path):
 
 def search_paper(query):
     if not doc_processor:
-        return "System not initialized."
+        return "System not initialized.", None, gr.update(visible=False)
     if not query:
-        return "Please enter a query."
+        return "Please enter a query.", None, gr.update(visible=False)
+    
+    page = doc_processor.search_page(query)
+    output = format_paper_results(page) or "No results found."
+    return output, page['next_cursor'], gr.update(visible=page['next_cursor'] is not None)
+
+def load_more_papers(current, cursor):
+    if not doc_processor or not cursor:
+        return current, None, gr.update(visible=False)
     
-    results = doc_processor.search(query)
-    return format_paper_results(results)
+    # Next page is served from the cached candidate list
+    page = doc_processor.search_page(cursor=cursor)
+    if page['restarted']:
+        # Results changed between pages: start the list over instead of appending
+        output = "*Results changed since the last page; showing fresh results.*\n\n" + format_paper_results(page)
+    else:
+        output = current + format_paper_results(page)
+    return output, page['next_cursor'], gr.update(visible=page['next_cursor'] is not None)
 
 def index_image_upload(file):
     if not img_processor:
@@ -130,13 +180,52 @@ def batch_index_image(dir_path):
         return f"Error: {str(e)}"
 
 def search_image(query):
-    if not img_processor:
+    if not img_processor or not query:
+        return [], [], None, gr.update(visible=False)
+    
+    page = img_processor.search_page(query)
+    images = format_image_results(page)
+    return images, images, page['next_cursor'], gr.update(visible=page['next_cursor'] is not None)
+
+def load_more_images(current, cursor):
+    if not img_processor or not cursor:
+        return current, current, None, gr.update(visible=False)
+    
+    page = img_processor.search_page(cursor=cursor)
+    # Results changed between pages: start the gallery over instead of appending
+    images = format_image_results(page) if page['restarted'] else current + format_image_results(page)
+    return images, images, page['next_cursor'], gr.update(visible=page['next_cursor'] is not None)
+
+def search_image_by_tag(tag):
+    if not db:
         return []
-    if not query:
+    if not tag:
         return []
     
-    results = img_processor.search_by_text(query)
-    return format_image_results(results)
+    # Pure metadata lookup, no model is loaded
+    tag = tag.strip()
+    hits = db.get_images_by_tag(tag, n_results=30)
+    images = []
+    for hit in hits:
+        meta = hit['metadata']
+        path = meta.get('path')
+        if os.path.exists(path):
+            images.append((path, f"{meta.get('filename')} ({tag}: {hit['score']:.2f})"))
+    return images
+
+def backfill_tags():
+    if not tagger:
+        return "System not initialized."
+    try:
+        count = tagger.backfill(db)
+        return f"Tagged {count} images."
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def model_status():
+    if not registry:
+        return "System not initialized."
+    return f"```\n{format_registry_report(registry)}\n```"
 
 # --- UI Layout ---
 
@@ -152,7 +241,10 @@ with gr.Blocks(title="Local Multimodal AI Agent") as demo:
                         paper_query = gr.Textbox(label="Search Query", placeholder="e.g., natural language processing models")
                         paper_search_btn = gr.Button("Search", variant="primary")
                     paper_results = gr.Markdown(label="Results")
-                    paper_search_btn.click(search_paper, inputs=paper_query, outputs=paper_results)
+                    paper_cursor = gr.State(None)
+                    paper_more_btn = gr.Button("Load More", visible=False)
+                    paper_search_btn.click(search_paper, inputs=paper_query, outputs=[paper_results, paper_cursor, paper_more_btn])
+                    paper_more_btn.click(load_more_papers, inputs=[paper_results, paper_cursor], outputs=[paper_results, paper_cursor, paper_more_btn])
                 
                 with gr.TabItem("Add Single Paper"):
                     paper_file = gr.File(label="Upload PDF", file_types=[".pdf"], type="filepath")
@@ -175,7 +267,21 @@ with gr.Blocks(title="Local Multimodal AI Agent") as demo:
                         image_query = gr.Textbox(label="Image Description", placeholder="e.g., a cute cat sleeping")
                         image_search_btn = gr.Button("Search", variant="primary")
                     image_results = gr.Gallery(label="Results", columns=3, height="auto")
-                    image_search_btn.click(search_image, inputs=image_query, outputs=image_results)
+                    image_items = gr.State([])
+                    image_cursor = gr.State(None)
+                    image_more_btn = gr.Button("Load More", visible=False)
+                    image_search_btn.click(search_image, inputs=image_query, outputs=[image_results, image_items, image_cursor, image_more_btn])
+                    image_more_btn.click(load_more_images, inputs=[image_items, image_cursor], outputs=[image_results, image_items, image_cursor, image_more_btn])
+                
+                with gr.TabItem("Search by Tag"):
+                    with gr.Row():
+                        tag_query = gr.Textbox(label="Tag", placeholder="e.g., dog")
+                        tag_search_btn = gr.Button("Search", variant="primary")
+                    tag_results = gr.Gallery(label="Results", columns=3, height="auto")
+                    tag_search_btn.click(search_image_by_tag, inputs=tag_query, outputs=tag_results)
+                    tag_backfill_btn = gr.Button("Backfill Tags for Indexed Images")
+                    tag_backfill_status = gr.Textbox(label="Status", interactive=False)
+                    tag_backfill_btn.click(backfill_tags, outputs=tag_backfill_status)
                 
                 with gr.TabItem("Index Single Image"):
                     image_file = gr.Image(label="Upload Image", type="filepath")
@@ -189,5 +295,11 @@ with gr.Blocks(title="Local Multimodal AI Agent") as demo:
                     image_batch_status = gr.Textbox(label="Status", interactive=False)
                     image_batch_btn.click(batch_index_image, inputs=image_dir, outputs=image_batch_status)
 
+        # Tab 3: Model residency
+        with gr.TabItem("⚙️ Models"):
+            model_refresh_btn = gr.Button("Refresh")
+            model_report = gr.Markdown()
+            model_refresh_btn.click(model_status, outputs=model_report)
+
 if __name__ == "__main__":
     demo.launch()
@@ -4,31 +4,76 @@ import sys
 from src.db_manager import DBManager
 from src.document_processor import DocumentProcessor
 from src.image_processor import ImageProcessor
+from src.image_tagger import ImageTagger, load_labels_or_default
+from src.model_registry import configure_registry, format_registry_report, get_registry
+from src.search_cache import configure_search_cache
 
-def print_paper_results(results):
-    print("\n--- Search Results ---")
-    if results['ids']:
-        for i, doc_id in enumerate(results['ids'][0]):
-            meta = results['metadatas'][0][i]
-            dist = results['distances'][0][i]
-            print(f"[{i+1}] {meta.get('filename')} (Score: {dist:.4f})")
-            print(f"    Path: {meta.get('path')}")
-            print(f"    Topics: {meta.get('topics')}")
-            print(f"    Snippet: {meta.get('snippet')}...\n")
+def format_total(page):
+    # 未取到全部结果时 total 只是下限
+    return f"{page['total']}" if page['total_exact'] else f"{page['total']}+"
+
+def print_restart_notice(page):
+    if page['restarted']:
+        print("\nResults changed since the previous page (new data indexed or cache expired); showing from the first page.")
+
+def print_paper_results(page):
+    print_restart_notice(page)
+    print(f"\n--- Search Results (Page {page['page']}, {format_total(page)} total) ---")
+    if page['items']:
+        start = (page['page'] - 1) * page['page_size']
+        for i, item in enumerate(page['items']):
+            print(f"[{start+i+1}] {item['filename']} (Score: {item['score']:.4f})")
+            print(f"    Path: {item['path']}")
+            print(f"    Thumbnail: {item['thumbnail']}")
+            print(f"    Topics: {item['topics']}")
+            print(f"    Snippet: {item['snippet']}...\n")
     else:
         print("No results found.")
 
-def print_image_results(results):
-    print("\n--- Image Search Results ---")
-    if results['ids']:
-        for i, img_id in enumerate(results['ids'][0]):
-            meta = results['metadatas'][0][i]
-            dist = results['distances'][0][i]
-            print(f"[{i+1}] {meta.get('filename')} (Score: {dist:.4f})")
-            print(f"    Path: {meta.get('path')}\n")
+def print_image_results(page):
+    print_restart_notice(page)
+    print(f"\n--- Image Search Results (Page {page['page']}, {format_total(page)} total) ---")
+    if page['items']:
+        start = (page['page'] - 1) * page['page_size']
+        for i, item in enumerate(page['items']):
+            print(f"[{start+i+1}] {item['filename']} (Score: {item['score']:.4f})")
+            print(f"    Path: {item['path']}")
+            print(f"    Thumbnail: {item['thumbnail']}\n")
     else:
         print("No results found.")
 
+def browse_pages(search_page, print_results, query):
+    # 交互式翻页：后续页通过 cursor 从缓存读取，不会重新查询
+    page = search_page(query)
+    print_results(page)
+    while page['next_cursor']:
+        if input("Load more? [y/N]: ").strip().lower() != 'y':
+            break
+        page = search_page(cursor=page['next_cursor'])
+        print_results(page)
+
+def print_tag_results(label, hits):
+    print(f"\n--- Images Tagged '{label}' ---")
+    if hits:
+        for i, hit in enumerate(hits):
+            meta = hit['metadata']
+            print(f"[{i+1}] {meta.get('filename')} (Tag Score: {hit['score']:.4f})")
+            print(f"    Path: {meta.get('path')}")
+            print(f"    Tags: {meta.get('tag_scores')}\n")
+    else:
+        print("No tagged images found.")
+
+def build_tagger(labels_path=None, top_k=3, min_score=0.1):
+    return ImageTagger(labels=load_labels_or_default(labels_path), top_k=top_k, min_score=min_score)
+
+def add_tagging_args(subparser, auto_tag=True):
+    # 所有入库/打标签命令共用同一组标签参数
+    if auto_tag:
+        subparser.add_argument("--auto-tag", action="store_true", help="Tag images with zero-shot CLIP labels at ingest")
+    subparser.add_argument("--labels", type=str, default=None, help="Text file with one tag label per line (default: built-in labels)")
+    subparser.add_argument("--top-k", type=int, default=3, help="Number of tags stored per image")
+    subparser.add_argument("--tag-min-score", type=float, default=0.1, help="Minimum score for a tag to be stored")
+
 def get_doc_processor(db, processor_instance):
     if processor_instance is None:
         print("\nInitializing Document Processor (loading models)...")
@@ -55,10 +100,13 @@ def run_interactive_mode(db):
         print("4. Index Image (Single File)")
         print("5. Index Image (Batch Directory)")
         print("6. Search Image")
+        print("7. Model Status")
+        print("8. Search Image by Tag")
+        print("9. Backfill Image Tags")
         print("0. Exit")
         print("==========================================")
         
-        choice = input("Select an option [0-6]: ").strip()
+        choice = input("Select an option [0-9]: ").strip()
 
         if choice == '0':
             print("Exiting...")
@@ -84,8 +132,7 @@ def run_interactive_mode(db):
             query = input("Enter search query: ").strip()
             if query:
                 doc_processor = get_doc_processor(db, doc_processor)
-                results = doc_processor.search(query)
-                print_paper_results(results)
+                browse_pages(doc_processor.search_page, print_paper_results, query)
 
         elif choice == '4':
             path = input("Enter image path: ").strip()
@@ -105,14 +152,30 @@ def run_interactive_mode(db):
             query = input("Enter image description: ").strip()
             if query:
                 img_processor = get_img_processor(db, img_processor)
-                results = img_processor.search_by_text(query)
-                print_image_results(results)
+                browse_pages(img_processor.search_page, print_image_results, query)
+
+        elif choice == '7':
+            print("\n--- Model Status ---")
+            print(format_registry_report(get_registry()))
+
+        elif choice == '8':
+            label = input("Enter tag (e.g., dog): ").strip()
+            if label:
+                # 纯元数据查询，不加载任何模型
+                hits = db.get_images_by_tag(label, n_results=20)
+                print_tag_results(label, hits)
+
+        elif choice == '9':
+            build_tagger().backfill(db)
 
         else:
             print("Invalid option, please try again.")
 
 def main():
     parser = argparse.ArgumentParser(description="Local Multimodal AI Agent")
+    parser.add_argument("--memory-budget-mb", type=float, default=None, help="Total memory budget for resident models in MB. Least recently used models are unloaded when exceeded.")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Unload models after this many idle seconds. They are reloaded on the next request.")
+    parser.add_argument("--search-depth", type=int, default=200, help="Number of candidates computed per search query before paging. Deeper pages extend it automatically.")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Command: add_paper
@@ -127,21 +190,40 @@ def main():
     # Command: search_paper
     parser_search_paper = subparsers.add_parser("search_paper", help="Search for papers using natural language")
     parser_search_paper.add_argument("query", type=str, help="Search query")
+    parser_search_paper.add_argument("--page", type=int, default=1, help="Result page to show (starting at 1)")
+    parser_search_paper.add_argument("--page-size", type=int, default=10, help="Number of results per page")
 
     # Command: search_image
     parser_search_image = subparsers.add_parser("search_image", help="Search for images using natural language description")
     parser_search_image.add_argument("query", type=str, help="Image description")
+    parser_search_image.add_argument("--page", type=int, default=1, help="Result page to show (starting at 1)")
+    parser_search_image.add_argument("--page-size", type=int, default=12, help="Number of results per page")
     
     # Command: index_image (Helper to add images for testing)
     parser_index_image = subparsers.add_parser("index_image", help="Index an image file")
     parser_index_image.add_argument("path", type=str, help="Path to the image file")
+    add_tagging_args(parser_index_image)
 
     # Command: batch_index_image
     parser_batch_index_image = subparsers.add_parser("batch_index_image", help="Batch index images from a directory")
     parser_batch_index_image.add_argument("dir_path", type=str, help="Path to the directory containing image files")
+    add_tagging_args(parser_batch_index_image)
+
+    # Command: backfill_tags
+    parser_backfill_tags = subparsers.add_parser("backfill_tags", help="Tag already-indexed images using their stored embeddings")
+    add_tagging_args(parser_backfill_tags, auto_tag=False)
+
+    # Command: search_tag
+    parser_search_tag = subparsers.add_parser("search_tag", help="Find images by tag (metadata lookup, no model loaded)")
+    parser_search_tag.add_argument("tag", type=str, help="Tag label, e.g. 'dog'")
+    parser_search_tag.add_argument("--min-score", type=float, default=0.0, help="Minimum tag score")
+    parser_search_tag.add_argument("--n", type=int, default=20, help="Maximum number of results")
 
     args = parser.parse_args()
 
+    configure_registry(memory_budget_mb=args.memory_budget_mb, idle_timeout=args.idle_timeout)
+    configure_search_cache(depth=max(1, args.search_depth))
+
     # Initialize DB
     try:
         db = DBManager()
@@ -165,21 +247,39 @@ def main():
 
     elif args.command == "search_paper":
         processor = DocumentProcessor(db)
-        results = processor.search(args.query)
-        print_paper_results(results)
+        try:
+            page = processor.search_page(args.query, page=args.page, page_size=args.page_size)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print_paper_results(page)
 
     elif args.command == "search_image":
         processor = ImageProcessor(db)
-        results = processor.search_by_text(args.query)
-        print_image_results(results)
+        try:
+            page = processor.search_page(args.query, page=args.page, page_size=args.page_size)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print_image_results(page)
             
     elif args.command == "index_image":
-        processor = ImageProcessor(db)
+        tagger = build_tagger(args.labels, args.top_k, args.tag_min_score) if args.auto_tag else None
+        processor = ImageProcessor(db, tagger=tagger)
         processor.process_image(args.path)
 
     elif args.command == "batch_index_image":
-        processor = ImageProcessor(db)
+        tagger = build_tagger(args.labels, args.top_k, args.tag_min_score) if args.auto_tag else None
+        processor = ImageProcessor(db, tagger=tagger)
         processor.process_directory(args.dir_path)
 
+    elif args.command == "backfill_tags":
+        build_tagger(args.labels, args.top_k, args.tag_min_score).backfill(db)
+
+    elif args.command == "search_tag":
+        tag = args.tag.strip()
+        hits = db.get_images_by_tag(tag, args.min_score, args.n)
+        print_tag_results(tag, hits)
+
 if __name__ == "__main__":
     main()
@@ -1,6 +1,19 @@
 import chromadb
 from chromadb.config import Settings
 import os
+import re
+import json
+import hashlib
+
+def tag_key(label):
+    """
+    标签对应的元数据字段名 (大小写与首尾空白不敏感)，例如 "Golden Retriever" -> "tag_golden_retriever_<hash>"
+    附加的短哈希保证不同标签 (包括中文等非 ASCII 标签) 总是得到不同的字段名
+    """
+    normalized = label.strip().lower()
+    slug = re.sub(r"[^a-z0-9]+", "_", normalized).strip("_")
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:8]
+    return f"tag_{slug}_{digest}" if slug else f"tag_{digest}"
 
 class DBManager:
     def __init__(self, persist_directory="embeddings"):
@@ -35,6 +48,12 @@ class DBManager:
             metadatas=[metadata]
         )
 
+    def count_papers(self):
+        """
+        文献条目数
+        """
+        return self.paper_collection.count()
+
     def search_papers(self, query_embedding, n_results=5):
         """
         搜索文献
@@ -55,6 +74,69 @@ class DBManager:
             metadatas=[metadata]
         )
 
+    def count_images(self):
+        """
+        图像条目数
+        """
+        return self.image_collection.count()
+
+    def add_images(self, img_ids, embeddings, metadatas):
+        """
+        批量添加图像嵌入到数据库
+        """
+        self.image_collection.add(
+            ids=img_ids,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+
+    def update_images(self, img_ids, metadatas):
+        """
+        批量更新图像元数据
+        """
+        self.image_collection.update(
+            ids=img_ids,
+            metadatas=metadatas
+        )
+
+    def iter_images(self, batch_size=256):
+        """
+        分批遍历已索引的图像，返回 (ids, embeddings, metadatas)
+        """
+        offset = 0
+        while True:
+            batch = self.image_collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "metadatas"]
+            )
+            if not batch['ids']:
+                break
+            yield batch['ids'], batch['embeddings'], batch['metadatas']
+            offset += len(batch['ids'])
+
+    def get_images_by_tag(self, label, min_score=0.0, n_results=20):
+        """
+        按标签查询图像 (纯元数据查询，不需要加载模型)，按标签分数降序返回
+        """
+        key = tag_key(label)
+        results = self.image_collection.get(
+            where={key: {"$gte": min_score}},
+            include=["metadatas"]
+        )
+        hits = []
+        for img_id, meta in zip(results['ids'], results['metadatas']):
+            # 过滤掉重新打标签后遗留的旧字段
+            try:
+                stored_tags = json.loads(meta.get('tags') or '[]')
+            except ValueError:
+                continue
+            if not any(tag_key(t) == key for t in stored_tags):
+                continue
+            hits.append({"id": img_id, "score": meta[key], "metadata": meta})
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return hits[:n_results]
+
     def search_images(self, query_embedding, n_results=5):
         """
         搜索图像
@@ -1,19 +1,26 @@
 import os
 import shutil
 import re
+import hashlib
 import fitz  # PyMuPDF
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
 from .db_manager import DBManager
+from .model_registry import ModelRegistry, get_registry
+from .search_cache import SearchCache, get_search_cache
 
 class DocumentProcessor:
-    def __init__(self, db_manager: DBManager, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, db_manager: DBManager, model_name='all-MiniLM-L6-v2', registry: ModelRegistry = None,
+                 search_cache: SearchCache = None):
         """
         初始化文献处理器
         """
         self.db = db_manager
-        print(f"Loading text embedding model: {model_name}...")
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        # 模型由注册中心统一管理：按需加载，空闲或超出内存预算时卸载
+        self.registry = registry or get_registry()
+        self.search_cache = search_cache or get_search_cache()
         self.docs_root = "docs"
+        self.thumbnails_root = "thumbnails"
         
         # 预定义常见主题用于语义分类 (可根据需要扩展)
         self.predefined_topics = [
@@ -25,7 +32,14 @@ class DocumentProcessor:
         ]
         # 预计算主题的 Embeddings 以加速分类
         print("Pre-computing topic embeddings for classification...")
-        self.topic_embeddings = self.model.encode(self.predefined_topics)
+        self.topic_embeddings = self.encode(self.predefined_topics)
+
+    def encode(self, inputs, **kwargs):
+        """
+        租用模型进行编码，编码期间模型不会被卸载
+        """
+        with self.registry.use(self.model_name) as model:
+            return model.encode(inputs, **kwargs)
 
     def extract_text_from_pdf(self, pdf_path):
         """
@@ -37,6 +51,27 @@ class DocumentProcessor:
             text += page.get_text()
         return text
 
+    def make_thumbnail(self, pdf_path, width=256):
+        """
+        渲染 PDF 首页为缩略图，已存在则直接返回路径 (失败返回 None)
+        """
+        digest = hashlib.sha1(os.path.abspath(pdf_path).encode("utf-8")).hexdigest()
+        thumb_path = os.path.join(self.thumbnails_root, f"paper_{digest}.png")
+        if os.path.exists(thumb_path):
+            return thumb_path
+        try:
+            with fitz.open(pdf_path) as doc:
+                page = doc[0]
+                zoom = width / page.rect.width
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            if not os.path.exists(self.thumbnails_root):
+                os.makedirs(self.thumbnails_root)
+            pix.save(thumb_path)
+            return thumb_path
+        except Exception as e:
+            print(f"Error creating thumbnail for {pdf_path}: {e}")
+            return None
+
     def extract_keywords(self, text):
         """
         尝试从文本中提取关键词 (简单的正则匹配)
@@ -111,7 +146,7 @@ class DocumentProcessor:
         text_for_embedding = full_text[:1000]
 
         # 2. 生成嵌入 (先获取 numpy array 用于分类，再转 list 存库)
-        embedding_np = self.model.encode(text_for_embedding)
+        embedding_np = self.encode(text_for_embedding)
         embedding = embedding_np.tolist()
 
         # 3. 处理 Topics 和文件移动
@@ -164,6 +199,9 @@ class DocumentProcessor:
             "topics": topics_str,
             "snippet": full_text[:200] # 存储前200字符作为预览
         }
+        thumbnail = self.make_thumbnail(target_path)
+        if thumbnail:
+            metadata["thumbnail"] = thumbnail
         
         self.db.add_paper(
             doc_id=filename,
@@ -171,12 +209,45 @@ class DocumentProcessor:
             document_text=text_for_embedding, # 存储用于搜索的文本
             metadata=metadata
         )
+        self.search_cache.invalidate("papers")
         print(f"Successfully indexed {filename}")
 
     def search(self, query_text, n_results=3):
         """
         搜索文献
         """
-        query_embedding = self.model.encode(query_text).tolist()
+        query_embedding = self.encode(query_text).tolist()
         results = self.db.search_papers(query_embedding, n_results)
         return results
+
+    def _search_candidates(self, query_text, depth):
+        results = self.search(query_text, n_results=depth)
+        candidates = []
+        if results['ids']:
+            for i, doc_id in enumerate(results['ids'][0]):
+                meta = results['metadatas'][0][i]
+                candidates.append({
+                    "id": doc_id,
+                    "score": results['distances'][0][i],
+                    "filename": meta.get('filename'),
+                    "path": meta.get('path'),
+                    "topics": meta.get('topics'),
+                    "snippet": meta.get('snippet'),
+                    "thumbnail": meta.get('thumbnail')
+                })
+        return candidates
+
+    def _fill_thumbnail(self, item):
+        if not item.get("thumbnail") and item.get("path") and os.path.exists(item["path"]):
+            item["thumbnail"] = self.make_thumbnail(item["path"])
+
+    def search_page(self, query_text=None, cursor=None, page=1, page_size=10):
+        """
+        分页搜索文献：首次查询计算较深的 top-k 候选并缓存，之后通过 cursor 或 page 翻页
+        """
+        return self.search_cache.page(
+            "papers", self._search_candidates, query=query_text, cursor=cursor,
+            page=page, page_size=page_size, decorate=self._fill_thumbnail,
+            # 以条目数作为数据版本，其他进程新增文献后缓存自动失效
+            version=self.db.count_papers()
+        )
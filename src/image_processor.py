@@ -1,17 +1,62 @@
 import os
+import hashlib
 from PIL import Image
-from sentence_transformers import SentenceTransformer
 from .db_manager import DBManager
+from .image_tagger import ImageTagger
+from .model_registry import ModelRegistry, get_registry
+from .search_cache import SearchCache, get_search_cache
 
 class ImageProcessor:
-    def __init__(self, db_manager: DBManager, model_name='clip-ViT-B-32'):
+    def __init__(self, db_manager: DBManager, model_name='clip-ViT-B-32', registry: ModelRegistry = None,
+                 tagger: ImageTagger = None, batch_size=32, search_cache: SearchCache = None):
         """
-        初始化图像处理器
+        初始化图像处理器 (CLIP 模型在首次使用时由注册中心加载)
+
+        tagger: 可选的零样本标注器，设置后入库时自动为图像打标签
         """
         self.db = db_manager
-        print(f"Loading CLIP model: {model_name}...")
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.registry = registry or get_registry()
+        self.tagger = tagger
+        self.batch_size = batch_size
+        self.search_cache = search_cache or get_search_cache()
         self.images_root = "images"
+        self.thumbnails_root = "thumbnails"
+
+    def encode(self, inputs, **kwargs):
+        """
+        租用模型进行编码，编码期间模型不会被卸载
+        """
+        with self.registry.use(self.model_name) as model:
+            return model.encode(inputs, **kwargs)
+
+    def make_thumbnail(self, image_path, img=None, size=(256, 256)):
+        """
+        生成图像缩略图，已存在则直接返回路径 (失败返回 None)
+
+        img: 可选，已经解码的图像，传入时直接缩放而不再从磁盘读取
+        """
+        digest = hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()
+        thumb_path = os.path.join(self.thumbnails_root, f"image_{digest}.jpg")
+        if os.path.exists(thumb_path):
+            return thumb_path
+        try:
+            if img is None:
+                with Image.open(image_path) as source:
+                    source.thumbnail(size)
+                    thumb = source.convert("RGB")
+            else:
+                # 先缩放副本再转换，避免复制整张原图
+                thumb = img.copy()
+                thumb.thumbnail(size)
+                thumb = thumb.convert("RGB")
+            if not os.path.exists(self.thumbnails_root):
+                os.makedirs(self.thumbnails_root)
+            thumb.save(thumb_path, "JPEG")
+            return thumb_path
+        except Exception as e:
+            print(f"Error creating thumbnail for {image_path}: {e}")
+            return None
 
     def process_image(self, image_path):
         """
@@ -31,7 +76,7 @@ class ImageProcessor:
             return
 
         # 2. 生成嵌入
-        embedding = self.model.encode(img).tolist()
+        embedding = self.encode(img).tolist()
 
         # 3. 存入数据库
         # 假设图像已经存在于 images 目录下，或者我们这里不移动，只索引
@@ -41,12 +86,18 @@ class ImageProcessor:
             "filename": filename,
             "path": image_path
         }
+        thumbnail = self.make_thumbnail(image_path, img)
+        if thumbnail:
+            metadata["thumbnail"] = thumbnail
+        if self.tagger:
+            metadata.update(self.tagger.tag_metadata(self.tagger.tag(embedding)[0]))
         
         self.db.add_image(
             img_id=filename,
             embedding=embedding,
             metadata=metadata
         )
+        self.search_cache.invalidate("images")
         print(f"Successfully indexed image {filename}")
 
     def process_directory(self, source_dir):
@@ -58,21 +109,104 @@ class ImageProcessor:
             return
 
         count = 0
+        batch = []
         valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
         for root, dirs, files in os.walk(source_dir):
             for file in files:
                 if os.path.splitext(file)[1].lower() in valid_extensions:
                     file_path = os.path.join(root, file)
                     print(f"Found Image: {file_path}")
-                    self.process_image(file_path)
-                    count += 1
+                    batch.append(file_path)
+                    if len(batch) >= self.batch_size:
+                        count += self.process_batch(batch)
+                        batch = []
+        if batch:
+            count += self.process_batch(batch)
         print(f"Batch processing complete. Processed {count} images.")
 
+    def process_batch(self, image_paths):
+        """
+        批量处理图像：一次编码整批图像，(可选) 向量化打标签，再批量存入 DB
+        """
+        images, paths = [], []
+        for image_path in image_paths:
+            try:
+                img = Image.open(image_path)
+                # Image.open 是惰性的，提前解码，让损坏的文件在这里被单独跳过
+                img.load()
+                images.append(img)
+                paths.append(image_path)
+            except Exception as e:
+                print(f"Error opening image {image_path}: {e}")
+        if not images:
+            return 0
+
+        embeddings = self.encode(images, batch_size=self.batch_size)
+        all_tags = self.tagger.tag(embeddings) if self.tagger else [None] * len(paths)
+
+        ids, embedding_list, metadatas = [], [], []
+        for image_path, img, embedding, tags in zip(paths, images, embeddings.tolist(), all_tags):
+            metadata = {
+                "filename": os.path.basename(image_path),
+                "path": image_path
+            }
+            if metadata["filename"] in ids:
+                print(f"Skipping duplicate filename {image_path}")
+                continue
+            thumbnail = self.make_thumbnail(image_path, img)
+            if thumbnail:
+                metadata["thumbnail"] = thumbnail
+            if tags is not None:
+                metadata.update(self.tagger.tag_metadata(tags))
+            ids.append(metadata["filename"])
+            embedding_list.append(embedding)
+            metadatas.append(metadata)
+
+        self.db.add_images(
+            img_ids=ids,
+            embeddings=embedding_list,
+            metadatas=metadatas
+        )
+        self.search_cache.invalidate("images")
+        print(f"Successfully indexed {len(ids)} images")
+        return len(ids)
+
     def search_by_text(self, query_text, n_results=3):
         """
         以文搜图
         """
         # CLIP 模型可以将文本映射到与图像相同的向量空间
-        query_embedding = self.model.encode(query_text).tolist()
+        query_embedding = self.encode(query_text).tolist()
         results = self.db.search_images(query_embedding, n_results)
         return results
+
+    def _search_candidates(self, query_text, depth):
+        results = self.search_by_text(query_text, n_results=depth)
+        candidates = []
+        if results['ids']:
+            for i, img_id in enumerate(results['ids'][0]):
+                meta = results['metadatas'][0][i]
+                candidates.append({
+                    "id": img_id,
+                    "score": results['distances'][0][i],
+                    "filename": meta.get('filename'),
+                    "path": meta.get('path'),
+                    "thumbnail": meta.get('thumbnail')
+                })
+        return candidates
+
+    def _fill_thumbnail(self, item):
+        # 早于缩略图功能索引的图像，在首次被翻到时补生成
+        if not item.get("thumbnail") and item.get("path") and os.path.exists(item["path"]):
+            item["thumbnail"] = self.make_thumbnail(item["path"])
+
+    def search_page(self, query_text=None, cursor=None, page=1, page_size=12):
+        """
+        分页以文搜图：首次查询计算较深的 top-k 候选并缓存，之后通过 cursor 或 page 翻页
+        """
+        return self.search_cache.page(
+            "images", self._search_candidates, query=query_text, cursor=cursor,
+            page=page, page_size=page_size, decorate=self._fill_thumbnail,
+            # 以条目数作为数据版本，其他进程新增图像后缓存自动失效
+            version=self.db.count_images()
+        )
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from .db_manager import tag_key
+from .model_registry import ModelRegistry, get_registry
+
+# 默认标签集合 (可通过标签文件替换，每行一个标签)
+DEFAULT_LABELS = [
+    "dog", "cat", "bird", "fish", "shark", "frog", "lizard", "snake", "turtle",
+    "spider", "insect", "butterfly", "monkey", "bear", "horse", "cow", "sheep",
+    "car", "truck", "airplane", "boat", "bicycle", "building", "food", "flower",
+    "tree", "mountain", "beach", "person", "furniture"
+]
+
+
+def load_labels(path):
+    """
+    从文本文件读取标签 (每行一个，忽略空行和 # 注释)
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_labels_or_default(path):
+    """
+    读取标签文件；未指定、无法读取或为空时 (打印警告) 使用默认标签
+    """
+    if not path:
+        return list(DEFAULT_LABELS)
+    try:
+        labels = load_labels(path)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Warning: could not read labels file {path}: {e}. Using default labels.")
+        return list(DEFAULT_LABELS)
+    if not labels:
+        print(f"Warning: labels file {path} is empty. Using default labels.")
+        return list(DEFAULT_LABELS)
+    return labels
+
+
+class ImageTagger:
+    def __init__(self, registry: ModelRegistry = None, model_name='clip-ViT-B-32', labels=None,
+                 top_k=3, min_score=0.1, prompt_template="a photo of a {}", cache_dir="embeddings"):
+        """
+        初始化零样本图像标注器
+
+        使用 CLIP 文本编码器预先计算标签嵌入矩阵并缓存到磁盘，
+        之后的打标签只需要一次矩阵乘法，不再需要加载模型。
+        """
+        self.registry = registry or get_registry()
+        self.model_name = model_name
+        self.labels = list(labels or DEFAULT_LABELS)
+        self.top_k = top_k
+        self.min_score = min_score
+        self.prompt_template = prompt_template
+        self.cache_dir = os.path.join(cache_dir, "label_cache")
+        self._label_embeddings = None
+
+    def _cache_path(self):
+        key = "\n".join([self.model_name, self.prompt_template] + self.labels)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_name)
+        return os.path.join(self.cache_dir, f"{safe_model}_{digest}.npy")
+
+    @property
+    def label_embeddings(self):
+        """
+        归一化后的标签嵌入矩阵 (num_labels x dim)，优先从磁盘缓存读取
+        """
+        if self._label_embeddings is None:
+            cache_path = self._cache_path()
+            if os.path.exists(cache_path):
+                self._label_embeddings = np.load(cache_path)
+            else:
+                print(f"Pre-computing embeddings for {len(self.labels)} tag labels...")
+                prompts = [self.prompt_template.format(label) for label in self.labels]
+                with self.registry.use(self.model_name) as model:
+                    matrix = np.asarray(model.encode(prompts, normalize_embeddings=True), dtype=np.float32)
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                np.save(cache_path, matrix)
+                self._label_embeddings = matrix
+        return self._label_embeddings
+
+    def tag(self, image_embeddings):
+        """
+        对一批图像嵌入打标签，返回每张图像的 [(label, score), ...] (按分数降序)
+        """
+        embeddings = np.asarray(image_embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        if len(embeddings) == 0:
+            return []
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+
+        # 余弦相似度 -> softmax 概率 (100 为 CLIP 的 logit scale)
+        logits = 100.0 * embeddings @ self.label_embeddings.T
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        k = min(self.top_k, probs.shape[1])
+        top_idx = np.argsort(-probs, axis=1)[:, :k]
+        results = []
+        for row, indices in zip(probs, top_idx):
+            results.append([
+                (self.labels[i], float(row[i])) for i in indices if row[i] >= self.min_score
+            ])
+        return results
+
+    def tag_metadata(self, tags):
+        """
+        将标签结果转换为可过滤的元数据字段 (tags / tag_scores 以 JSON 存储，标签中可包含逗号)
+        """
+        metadata = {
+            "tags": json.dumps([label for label, _ in tags], ensure_ascii=False),
+            "tag_scores": json.dumps({label: round(score, 4) for label, score in tags}, ensure_ascii=False)
+        }
+        for label, score in tags:
+            metadata[tag_key(label)] = score
+        return metadata
+
+    def backfill(self, db_manager, batch_size=256):
+        """
+        使用数据库中已存储的图像向量为已索引的图像批量打标签 (无需重新读取图像)
+        """
+        count = 0
+        for ids, embeddings, metadatas in db_manager.iter_images(batch_size=batch_size):
+            all_tags = self.tag(embeddings)
+            updated = []
+            for meta, tags in zip(metadatas, all_tags):
+                meta = dict(meta or {})
+                meta.update(self.tag_metadata(tags))
+                updated.append(meta)
+            db_manager.update_images(ids, updated)
+            count += len(ids)
+            print(f"Tagged {count} images...")
+        print(f"Backfill complete. Tagged {count} images.")
+        return count
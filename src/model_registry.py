@@ -0,0 +1,304 @@
+import gc
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def load_sentence_transformer(name):
+    """
+    默认加载函数 (延迟导入，注册中心本身不依赖 sentence-transformers)
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def estimate_model_size(model):
+    """
+    估算模型占用的内存 (字节)：参数 + buffers
+    """
+    size = 0
+    try:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            size += tensor.numel() * tensor.element_size()
+    except AttributeError:
+        pass
+    return size
+
+
+class ModelRegistry:
+    def __init__(self, memory_budget_mb=None, idle_timeout=None, loader=None, max_events=200):
+        """
+        初始化模型注册中心
+
+        memory_budget_mb: 常驻模型的总内存预算 (MB)，None 表示不限制
+        idle_timeout: 模型空闲多少秒后被卸载，None 表示永不卸载
+        loader: 加载函数 name -> model，默认使用 SentenceTransformer
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout = idle_timeout
+        self.loader = loader or load_sentence_transformer
+
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._models = {}  # name -> 常驻模型
+        self._stats = {}   # name -> 加载/卸载统计 (卸载后仍保留)
+        self._events = deque(maxlen=max_events)
+        self._oversized_warned = set()  # 单独就超出预算的模型，只警告一次
+
+        self._reaper = None
+        self._reaper_stop = threading.Event()
+        if self.idle_timeout:
+            self._start_reaper()
+
+    @contextmanager
+    def use(self, name):
+        """
+        租用模型：with registry.use(name) as model: ...
+        未加载时自动加载 (卸载过的模型会被透明地重新加载)，
+        租用期间模型不会被空闲回收或内存预算卸载
+        """
+        model = self._acquire(name)
+        try:
+            yield model
+        finally:
+            self._release(name)
+
+    def _acquire(self, name):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                entry["refs"] += 1
+                entry["last_used"] = time.time()
+                return entry["model"]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # 每个模型独立加锁，保证同一模型只加载一次，且不阻塞其他模型的访问
+        with load_lock:
+            evicted = []
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    entry["refs"] += 1
+                    entry["last_used"] = time.time()
+                    return entry["model"]
+                stats = self._stats.setdefault(name, {
+                    "load_count": 0,
+                    "evict_count": 0,
+                    "last_load_seconds": None,
+                    "total_load_seconds": 0.0,
+                    "size_bytes": 0,
+                })
+                # 重新加载时模型大小已知，先腾出空间，避免峰值超出预算
+                if stats["size_bytes"]:
+                    evicted = self._enforce_budget(keep=name, incoming=stats["size_bytes"])
+            if evicted:
+                self._release_memory()
+
+            event = "reload" if stats["load_count"] else "load"
+            print(f"Loading model: {name}...")
+            start = time.perf_counter()
+            model = self.loader(name)
+            seconds = time.perf_counter() - start
+            size = estimate_model_size(model)
+
+            with self._lock:
+                now = time.time()
+                self._models[name] = {
+                    "model": model,
+                    "size": size,
+                    "loaded_at": now,
+                    "last_used": now,
+                    "refs": 1,
+                }
+                stats["load_count"] += 1
+                stats["last_load_seconds"] = seconds
+                stats["total_load_seconds"] += seconds
+                stats["size_bytes"] = size
+                self._record(event, name, seconds=seconds, size=size)
+                evicted = self._enforce_budget(keep=name)
+            if evicted:
+                self._release_memory()
+            return model
+
+    def _release(self, name):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            entry["last_used"] = time.time()
+            # 之前因其他模型正在使用而无法满足预算时，在租约结束后补做卸载 (保留刚用完的模型)
+            evicted = self._enforce_budget(keep=name) if entry["refs"] == 0 else []
+        if evicted:
+            self._release_memory()
+
+    def _pop(self, name, reason, force=False):
+        """
+        从注册中心移除模型 (调用方需持有 self._lock，内存回收在释放锁之后进行)
+        """
+        entry = self._models.get(name)
+        if entry is None or (entry["refs"] > 0 and not force):
+            return False
+        del self._models[name]
+        self._stats[name]["evict_count"] += 1
+        idle = time.time() - entry["last_used"]
+        self._record("evict", name, size=entry["size"], reason=reason, idle_seconds=idle)
+        print(f"Unloaded model: {name} ({reason})")
+        return True
+
+    def evict_idle(self):
+        """
+        卸载所有空闲时间超过 idle_timeout 且未被使用的模型
+        """
+        if not self.idle_timeout:
+            return []
+        now = time.time()
+        evicted = []
+        with self._lock:
+            for name, entry in list(self._models.items()):
+                if now - entry["last_used"] >= self.idle_timeout and self._pop(name, reason="idle"):
+                    evicted.append(name)
+        if evicted:
+            self._release_memory()
+        return evicted
+
+    def _enforce_budget(self, keep, incoming=0):
+        """
+        超出内存预算时，按最近最少使用顺序卸载其他未被使用的模型 (incoming 为即将加载的模型大小)
+        调用方需持有 self._lock，返回被卸载的模型名
+        """
+        if self.memory_budget_mb is None:
+            return []
+        budget = self.memory_budget_mb * 1024 * 1024
+        candidates = sorted(
+            (name for name, entry in self._models.items() if name != keep and entry["refs"] == 0),
+            key=lambda name: self._models[name]["last_used"]
+        )
+        evicted = []
+        for name in candidates:
+            if self.resident_bytes() + incoming <= budget:
+                break
+            if self._pop(name, reason="budget"):
+                evicted.append(name)
+        keep_size = self._stats.get(keep, {}).get("size_bytes", 0)
+        if keep_size > budget and keep not in self._oversized_warned:
+            self._oversized_warned.add(keep)
+            print(f"Warning: model {keep} ({keep_size / (1024 * 1024):.0f} MB) alone exceeds "
+                  f"the memory budget of {self.memory_budget_mb} MB; it stays loaded while in use.")
+        return evicted
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry["size"] for entry in self._models.values())
+
+    def stats(self):
+        """
+        返回每个模型的常驻状态与加载/卸载统计
+        """
+        now = time.time()
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                entry = self._models.get(name)
+                result[name] = dict(stats)
+                result[name]["loaded"] = entry is not None
+                result[name]["size_mb"] = entry["size"] / (1024 * 1024) if entry else 0.0
+                result[name]["idle_seconds"] = now - entry["last_used"] if entry else None
+                result[name]["in_use"] = entry["refs"] if entry else 0
+            return result
+
+    def events(self):
+        """
+        返回最近的 load / reload / evict 事件 (按时间顺序)
+        """
+        with self._lock:
+            return list(self._events)
+
+    def shutdown(self):
+        """
+        停止空闲回收线程并卸载所有模型
+        """
+        self._reaper_stop.set()
+        with self._lock:
+            names = list(self._models)
+            for name in names:
+                self._pop(name, reason="shutdown", force=True)
+        if names:
+            self._release_memory()
+
+    def _record(self, event, name, **details):
+        record = {"time": time.time(), "event": event, "model": name}
+        record.update(details)
+        self._events.append(record)
+
+    def _release_memory(self):
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def _start_reaper(self):
+        interval = max(1.0, min(self.idle_timeout / 2, 30.0))
+
+        def run():
+            while not self._reaper_stop.wait(interval):
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=run, name="model-registry-reaper", daemon=True)
+        self._reaper.start()
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    获取进程内共享的默认注册中心
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
+
+
+def configure_registry(memory_budget_mb=None, idle_timeout=None, loader=None):
+    """
+    使用给定配置替换默认注册中心 (应在创建处理器之前调用)
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is not None:
+            _default_registry.shutdown()
+        _default_registry = ModelRegistry(
+            memory_budget_mb=memory_budget_mb,
+            idle_timeout=idle_timeout,
+            loader=loader
+        )
+        return _default_registry
+
+
+def format_registry_report(registry):
+    """
+    生成模型常驻状态与事件的文本报告
+    """
+    lines = [f"Resident memory: {registry.resident_bytes() / (1024 * 1024):.1f} MB"
+             + (f" / budget {registry.memory_budget_mb} MB" if registry.memory_budget_mb else "")]
+    for name, s in registry.stats().items():
+        state = f"loaded ({s['size_mb']:.1f} MB, idle {s['idle_seconds']:.0f}s)" if s["loaded"] else "unloaded"
+        last = f"{s['last_load_seconds']:.2f}s" if s["last_load_seconds"] is not None else "-"
+        lines.append(f"- {name}: {state}, loads={s['load_count']}, evictions={s['evict_count']}, "
+                     f"last load {last}, total load {s['total_load_seconds']:.2f}s")
+    events = registry.events()
+    if events:
+        lines.append("Recent events:")
+        for e in events[-10:]:
+            stamp = time.strftime("%H:%M:%S", time.localtime(e["time"]))
+            extra = f" {e['seconds']:.2f}s" if "seconds" in e else f" ({e.get('reason')})"
+            lines.append(f"  {stamp} {e['event']} {e['model']}{extra}")
+    return "\n".join(lines)
@@ -0,0 +1,184 @@
+import base64
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def encode_cursor(state):
+    """
+    将分页状态编码为不透明的游标字符串
+    """
+    raw = json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    解码并校验游标，格式无效时抛出 ValueError
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(state, dict) or not {"k", "q", "o", "n"} <= state.keys():
+        raise ValueError("Invalid cursor: missing fields")
+    if not isinstance(state["k"], str) or not isinstance(state["q"], str):
+        raise ValueError("Invalid cursor: bad query")
+    if not isinstance(state["o"], int) or state["o"] < 0:
+        raise ValueError("Invalid cursor: offset must be >= 0")
+    if not isinstance(state["n"], int) or state["n"] < 1:
+        raise ValueError("Invalid cursor: page size must be >= 1")
+    if not isinstance(state.get("g"), str):
+        raise ValueError("Invalid cursor: missing result generation")
+    return state
+
+
+class SearchCache:
+    def __init__(self, max_entries=128, depth=200, ttl=300):
+        """
+        初始化搜索结果缓存
+
+        max_entries: 最多缓存的查询数 (LRU 淘汰)
+        depth: 每个查询首次计算的候选结果数 (top-k)，翻页超出时按倍数加深
+        ttl: 缓存有效期 (秒)，保证其他进程新索引的数据最终可见，None 表示不过期
+        """
+        self.max_entries = max_entries
+        self.depth = depth
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (kind, query) -> 缓存条目
+
+    def get(self, key, version=None):
+        """
+        读取缓存条目；过期或数据版本 (如集合条目数) 变化时视为未命中
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expired = self.ttl is not None and time.time() - entry["created"] > self.ttl
+            if expired or entry["version"] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, candidates, depth, version=None, generation=None):
+        """
+        缓存候选列表。candidates 应按 depth + 1 计算：多出的一条只用于判断是否还有更多结果。
+
+        generation: 结果代次，加深同一份结果时沿用，重新计算 (数据变化/过期/淘汰) 时生成新值
+        """
+        entry = {
+            "candidates": candidates[:depth],
+            "depth": depth,
+            # 没有取到第 depth + 1 条，说明已经拿到了全部结果
+            "exhausted": len(candidates) <= depth,
+            "version": version,
+            "created": time.time(),
+            "generation": generation or uuid.uuid4().hex[:12]
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, kind):
+        """
+        清除某类结果的所有缓存 (索引新数据后调用)
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == kind]:
+                del self._entries[key]
+
+    def page(self, kind, compute, query=None, cursor=None, page=1, page_size=10, decorate=None, version=None):
+        """
+        返回一页结果：首次查询时调用 compute(query, depth) 计算候选列表并缓存，
+        之后的页直接从缓存切片。翻页超出已计算的深度时，加倍深度重新计算；
+        缓存被淘汰或过期时会根据游标中的查询重新计算。游标记录结果代次，
+        若重新计算后代次不同 (结果可能已变化)，从第 1 页重新开始并标记 restarted，
+        避免在新列表上沿用旧偏移导致重复或遗漏。
+
+        decorate: 可选，对本页每个条目补充数据 (如缩略图)，结果会写回缓存供后续复用
+        version: 可选，数据版本标识 (如集合条目数)，变化时缓存失效
+        """
+        generation = None
+        if cursor:
+            state = decode_cursor(cursor)
+            if state["k"] != kind:
+                raise ValueError(f"Cursor belongs to '{state['k']}' results, not '{kind}'.")
+            query, offset, page_size, generation = state["q"], state["o"], state["n"], state["g"]
+        else:
+            if page < 1 or page_size < 1:
+                raise ValueError("page and page_size must be positive.")
+            offset = (page - 1) * page_size
+
+        key = (kind, query)
+        end = offset + page_size
+        entry = self.get(key, version)
+        if entry is None:
+            depth = max(self.depth, end)
+            entry = self.put(key, compute(query, depth + 1), depth, version)
+
+        restarted = generation is not None and generation != entry["generation"]
+        if restarted:
+            offset, end = 0, page_size
+
+        while end > len(entry["candidates"]) and not entry["exhausted"]:
+            depth = max(entry["depth"] * 2, end)
+            entry = self.put(key, compute(query, depth + 1), depth, version, entry["generation"])
+
+        candidates = entry["candidates"]
+        items = candidates[offset:end]
+        if decorate:
+            for item in items:
+                decorate(item)
+
+        next_cursor = None
+        if offset + len(items) < len(candidates) or (items and not entry["exhausted"]):
+            next_cursor = encode_cursor({
+                "k": kind, "q": query, "o": offset + len(items), "n": page_size,
+                "g": entry["generation"]
+            })
+        return {
+            "query": query,
+            "items": items,
+            "page": offset // page_size + 1,
+            "page_size": page_size,
+            # total 仅在取到全部结果时是精确值，否则为目前已知的下限
+            "total": len(candidates),
+            "total_exact": entry["exhausted"],
+            "next_cursor": next_cursor,
+            # 结果在翻页期间发生了变化，本页是新结果的第 1 页
+            "restarted": restarted
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_search_cache():
+    """
+    获取进程内共享的默认搜索缓存
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SearchCache()
+        return _default_cache
+
+
+def configure_search_cache(max_entries=128, depth=200, ttl=300):
+    """
+    使用给定配置替换默认搜索缓存 (应在创建处理器之前调用)
+    """
+    global _default_cache
+    with _default_lock:
+        _default_cache = SearchCache(max_entries=max_entries, depth=depth, ttl=ttl)
+        return _default_cache
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from src.model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeTensor:
+    def __init__(self, size):
+        self.size = size
+
+    def numel(self):
+        return self.size
+
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    def __init__(self, name, size_mb):
+        self.name = name
+        self.size_mb = size_mb
+
+    def parameters(self):
+        return [FakeTensor(self.size_mb * MB)]
+
+    def buffers(self):
+        return []
+
+
+def make_registry(sizes, **kwargs):
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        time.sleep(0.01)
+        return FakeModel(name, sizes[name])
+
+    return ModelRegistry(loader=loader, **kwargs), loads
+
+
+def resident(registry):
+    return {name for name, s in registry.stats().items() if s["loaded"]}
+
+
+def test_concurrent_use_loads_once():
+    registry, loads = make_registry({"a": 10})
+
+    def worker():
+        with registry.use("a"):
+            pass
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loads == ["a"]
+    assert registry.stats()["a"]["in_use"] == 0
+
+
+def test_budget_evicts_least_recently_used():
+    registry, loads = make_registry({"a": 100, "b": 100}, memory_budget_mb=150)
+    with registry.use("a"):
+        pass
+    with registry.use("b"):
+        pass
+    assert resident(registry) == {"b"}
+
+    with registry.use("a") as model:
+        assert model.name == "a"
+    assert loads == ["a", "b", "a"]
+    events = [(e["event"], e["model"]) for e in registry.events()]
+    assert events == [("load", "a"), ("load", "b"), ("evict", "a"), ("evict", "b"), ("reload", "a")]
+
+
+def test_leased_model_is_not_evicted_until_released():
+    registry, _ = make_registry({"a": 100, "b": 100}, memory_budget_mb=150)
+    with registry.use("a"):
+        with registry.use("b"):
+            assert resident(registry) == {"a", "b"}
+        # b was just used, so releasing it keeps b; a is still leased
+        assert resident(registry) == {"a", "b"}
+    # Releasing a restores the budget without dropping the model just used
+    assert resident(registry) == {"a"}
+
+
+def test_oversized_model_stays_loaded_and_warns_once(capsys):
+    registry, loads = make_registry({"clip": 580}, memory_budget_mb=512)
+    for _ in range(3):
+        with registry.use("clip"):
+            pass
+
+    assert loads == ["clip"]
+    assert registry.stats()["clip"]["evict_count"] == 0
+    assert capsys.readouterr().out.count("Warning") == 1
+
+
+def test_idle_models_are_evicted_and_reloaded():
+    registry, loads = make_registry({"a": 10}, idle_timeout=0.05)
+    with registry.use("a"):
+        time.sleep(0.1)
+        # In use, so never idle-evicted
+        assert registry.evict_idle() == []
+    time.sleep(0.1)
+    assert registry.evict_idle() == ["a"]
+    assert resident(registry) == set()
+
+    with registry.use("a"):
+        pass
+    assert loads == ["a", "a"]
+    stats = registry.stats()["a"]
+    assert stats["load_count"] == 2
+    assert stats["evict_count"] == 1
+    registry.shutdown()
+
+
+def test_shutdown_unloads_everything():
+    registry, _ = make_registry({"a": 10, "b": 10})
+    for name in ("a", "b"):
+        with registry.use(name):
+            pass
+    registry.shutdown()
+    assert resident(registry) == set()
+    assert registry.resident_bytes() == 0
@@ -0,0 +1,92 @@
+import pytest
+
+from src.search_cache import SearchCache, decode_cursor, encode_cursor
+
+
+def make_compute(total):
+    calls = []
+
+    def compute(query, k):
+        calls.append(k)
+        return list(range(min(total, k)))
+
+    return compute, calls
+
+
+def collect(cache, compute, page_size, **kwargs):
+    page = cache.page("images", compute, query="dog", page_size=page_size, **kwargs)
+    items = list(page["items"])
+    while page["next_cursor"]:
+        page = cache.page("images", compute, cursor=page["next_cursor"], **kwargs)
+        items += page["items"]
+    return items, page
+
+
+def test_pages_are_served_from_cache():
+    compute, calls = make_compute(25)
+    cache = SearchCache(depth=50)
+    items, last = collect(cache, compute, page_size=10)
+    assert items == list(range(25))
+    assert calls == [51]
+    assert last["total"] == 25 and last["total_exact"]
+
+
+def test_depth_grows_past_initial_limit():
+    compute, calls = make_compute(1000)
+    cache = SearchCache(depth=200)
+    page = cache.page("images", compute, query="dog", page=25, page_size=10)
+    assert page["items"][0] == 240
+    assert not page["total_exact"]
+
+    items, last = collect(cache, compute, page_size=100)
+    assert items == list(range(1000))
+    assert last["total"] == 1000 and last["total_exact"]
+
+
+def test_result_count_equal_to_depth_has_no_empty_last_page():
+    compute, _ = make_compute(20)
+    cache = SearchCache(depth=10)
+    page = cache.page("images", compute, query="dog", page=2, page_size=10)
+    assert page["items"] == list(range(10, 20))
+    assert page["next_cursor"] is None
+    assert page["total_exact"]
+
+
+def test_cursor_restarts_when_results_change():
+    compute, _ = make_compute(30)
+    cache = SearchCache(depth=50)
+    first = cache.page("images", compute, query="dog", page_size=10, version=30)
+    second = cache.page("images", compute, cursor=first["next_cursor"], version=30)
+    assert second["items"] == list(range(10, 20)) and not second["restarted"]
+
+    # Another process indexed more data: the collection count changed
+    third = cache.page("images", compute, cursor=second["next_cursor"], version=31)
+    assert third["restarted"]
+    assert third["page"] == 1
+    assert third["items"] == list(range(10))
+
+
+def test_expired_entries_are_recomputed():
+    compute, calls = make_compute(5)
+    cache = SearchCache(depth=10, ttl=0)
+    cache.page("images", compute, query="dog")
+    cache.page("images", compute, query="dog")
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("state", [
+    {"k": "images", "q": "dog", "o": 0, "n": 0, "g": "x"},
+    {"k": "images", "q": "dog", "o": -5, "n": 3, "g": "x"},
+    {"k": "images", "q": "dog", "o": 0, "n": 3},
+])
+def test_invalid_cursors_are_rejected(state):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(state))
+
+
+def test_cursor_of_other_kind_is_rejected():
+    compute, _ = make_compute(30)
+    cache = SearchCache(depth=50)
+    page = cache.page("images", compute, query="dog", page_size=10)
+    with pytest.raises(ValueError):
+        cache.page("papers", compute, cursor=page["next_cursor"])